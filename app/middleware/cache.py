@@ -0,0 +1,74 @@
+"""
+Middleware ASGI de caché en memoria para respuestas GET idempotentes
+"""
+
+from cachetools import TTLCache
+
+
+def _no_store(headers):
+    """Indicar si la respuesta pide no ser guardada (Cache-Control: no-store)"""
+    return any(
+        name.lower() == b"cache-control" and b"no-store" in value.lower()
+        for name, value in headers
+    )
+
+
+class ResponseCacheMiddleware:
+    """
+    Guarda por (ruta, query string) las respuestas 200 de los GET bajo los
+    prefijos indicados y las repite mientras dure el TTL, sin ejecutar el
+    endpoint ni volver a serializar. Las respuestas marcadas con
+    Cache-Control: no-store no se guardan. Cada proceso worker tiene su propia caché.
+    """
+
+    def __init__(self, app, prefixes, exclude=(), ttl=60, maxsize=256):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+        self.exclude = frozenset(exclude)
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.prefixes)
+            or scope["path"] in self.exclude
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], scope["query_string"])
+        cached = self.cache.get(key)
+        if cached is not None:
+            status, headers, body, route = cached
+            # El enrutador no se ejecuta: devolver al scope la ruta que resolvió
+            # (la usan las métricas de las capas externas)
+            if route is not None:
+                scope["route"] = route
+            # Copia de las cabeceras: las capas externas (CORS) las modifican
+            await send({
+                "type": "http.response.start",
+                "status": status,
+                "headers": list(headers),
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        status = None
+        headers = None
+        store = False
+        chunks = []
+
+        async def send_and_record(message):
+            nonlocal status, headers, store
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = tuple(message.get("headers", ()))
+                store = status == 200 and not _no_store(headers)
+            elif message["type"] == "http.response.body" and store:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self.cache[key] = (status, headers, b"".join(chunks), scope.get("route"))
+            await send(message)
+
+        await self.app(scope, receive, send_and_record)
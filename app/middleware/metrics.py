@@ -0,0 +1,97 @@
+"""
+Middleware ASGI de métricas Prometheus: conteo y latencia por ruta
+"""
+
+import os
+import time
+from functools import lru_cache
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Cualquier otro método (enviado por el cliente) se agrupa como OTHER
+KNOWN_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+)
+
+REQUEST_COUNT = Counter(
+    "http_requests_total",
+    "Peticiones HTTP atendidas",
+    ("method", "route", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Duración de las peticiones HTTP en segundos",
+    ("method", "route"),
+)
+
+
+# Hijos con etiquetas resueltos una vez por combinación
+@lru_cache(maxsize=1024)
+def _count_child(method, route, status):
+    return REQUEST_COUNT.labels(method, route, str(status))
+
+
+@lru_cache(maxsize=512)
+def _latency_child(method, route):
+    return REQUEST_LATENCY.labels(method, route)
+
+
+def render_metrics():
+    """
+    Serializar las métricas en formato Prometheus
+
+    Con varios workers (PROMETHEUS_MULTIPROC_DIR definido) se agregan las
+    métricas de todos los procesos.
+    """
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class PrometheusMiddleware:
+    """
+    Mide cada petición HTTP sin BaseHTTPMiddleware. La etiqueta de ruta es la
+    plantilla (/ocr/history/{user_id}), no la ruta concreta, para no crear una
+    serie por usuario.
+    """
+
+    def __init__(self, app, exclude=("/metrics",)):
+        self.app = app
+        self.exclude = frozenset(exclude)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter_ns()
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            # El enrutador de FastAPI deja la ruta resuelta en el scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            if method not in KNOWN_METHODS:
+                method = "OTHER"
+            _count_child(method, route_path, status).inc()
+            _latency_child(method, route_path).observe(
+                (time.perf_counter_ns() - start) / 1e9
+            )
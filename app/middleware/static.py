@@ -0,0 +1,50 @@
+"""
+Middleware ASGI para responder rutas de contenido fijo sin pasar por el resto de la aplicación
+"""
+
+
+class StaticResponseMiddleware:
+    """
+    Responde GET/HEAD de rutas fijas (/, /health) con un cuerpo precalculado,
+    buscando la ruta en un diccionario antes de CORS y del enrutador de
+    FastAPI. Las peticiones con cabecera Origin (navegadores) siguen el
+    camino normal para recibir sus cabeceras CORS.
+    """
+
+    def __init__(self, app, responses, cache_control="public, max-age=1"):
+        self.app = app
+        # ruta -> (cabeceras, cuerpo), calculado una sola vez; las tuplas
+        # inmutables se envían tal cual en cada respuesta sin copiarlas
+        cache_header = (b"cache-control", cache_control.encode("latin-1"))
+        self.responses = {
+            path: (
+                (
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    cache_header,
+                ),
+                body,
+            )
+            for path, body in responses.items()
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        response = self.responses.get(scope["path"])
+        if response is None or any(name == b"origin" for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        headers, body = response
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": headers,
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b"" if scope["method"] == "HEAD" else body,
+        })
@@ -3,11 +3,13 @@ Router para endpoints de Audio y procesamiento de encuestas
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks, Request
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 import json
 import json
 import asyncio
 import logging
+import orjson
 
 from app.services.audio_service import audio_service
 from app.services.survey_processor import survey_processor
@@ -22,6 +24,38 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/audio", tags=["Audio"])
 
+# Formatos soportados: respuesta fija serializada una sola vez al importar
+_FORMATS_BYTES = orjson.dumps({
+    "supported_formats": [
+        {
+            "extension": ".mp3",
+            "description": "MP3 Audio"
+        },
+        {
+            "extension": ".wav", 
+            "description": "WAV Audio"
+        },
+        {
+            "extension": ".m4a",
+            "description": "M4A Audio" 
+        },
+        {
+            "extension": ".flac",
+            "description": "FLAC Audio"
+        },
+        {
+            "extension": ".ogg",
+            "description": "OGG Audio"
+        },
+        {
+            "extension": ".webm",
+            "description": "WebM Audio"
+        }
+    ],
+    "max_file_size": "25MB",
+    "recommended_format": "mp3 o wav para mejor compatibilidad"
+})
+
 @router.post("/process")
 async def procesar_encuesta_audio_con_notificaciones(
     request: Request,
@@ -116,8 +150,9 @@ async def procesar_encuesta_audio_sincrono(
         
         audio_bytes = await audio_file.read()
         
-        # Procesar audio inmediatamente
-        result = await process_audio_survey_complete(
+        # Procesar audio inmediatamente (en el threadpool: todo el flujo es bloqueante)
+        result = await run_in_threadpool(
+            process_audio_survey_complete,
             audio_bytes, 
             audio_file.filename, 
             entrega_id, 
@@ -132,7 +167,7 @@ async def procesar_encuesta_audio_sincrono(
         logger.error(f"Error en procesamiento síncrono: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_audio_survey_background(
+def process_audio_survey_background(
     audio_bytes: bytes,
     filename: str, 
     entrega_id: str,
@@ -141,12 +176,15 @@ async def process_audio_survey_background(
 ):
     """
     Procesamiento completo de audio en background
+    
+    Es síncrona a propósito: BackgroundTasks la ejecuta en el threadpool y las
+    llamadas bloqueantes (S3, Whisper, Gemini, BD, Firebase) no detienen el event loop.
     """
     try:
         logger.info(f"Iniciando procesamiento background para entrega {entrega_id}")
         
         # Enviar notificación de inicio
-        await send_notification(
+        send_notification(
             fcm_token, 
             "Audio en procesamiento", 
             "Tu audio está siendo transcrito y analizado...",
@@ -154,11 +192,11 @@ async def process_audio_survey_background(
         )
         
         # Procesar audio completo
-        result = await process_audio_survey_complete(audio_bytes, filename, entrega_id, user_id)
+        result = process_audio_survey_complete(audio_bytes, filename, entrega_id, user_id)
         
         if result["success"]:
             # Notificación de éxito
-            await send_notification(
+            send_notification(
                 fcm_token,
                 "Audio procesado exitosamente",
                 f"Tu encuesta ha sido completada. {len(result.get('respuestas', []))} respuestas procesadas.",
@@ -167,7 +205,7 @@ async def process_audio_survey_background(
             logger.info(f"Audio procesado exitosamente para entrega {entrega_id}")
         else:
             # Notificación de error
-            await send_notification(
+            send_notification(
                 fcm_token,
                 "Error procesando audio",
                 f"Hubo un problema al procesar tu audio: {result.get('error', 'Error desconocido')}",
@@ -178,14 +216,14 @@ async def process_audio_survey_background(
     except Exception as e:
         logger.error(f"Error en background task: {e}")
         # Notificación de error crítico
-        await send_notification(
+        send_notification(
             fcm_token,
             "Error crítico",
             "Hubo un error inesperado procesando tu audio. Intenta nuevamente.",
             {"type": "audio_processing_critical_error", "entrega_id": entrega_id}
         )
 
-async def process_audio_survey_complete(
+def process_audio_survey_complete(
     audio_bytes: bytes,
     filename: str,
     entrega_id: str,
@@ -197,15 +235,11 @@ async def process_audio_survey_complete(
     try:
         # 1. Subir audio a S3
         logger.info(f"Subiendo audio a S3...")
-        s3_url = await upload_audio_to_s3(audio_bytes, "", user_id, filename)
+        s3_url = upload_audio_to_s3(audio_bytes, "", user_id, filename)
         
-        # 2. Obtener preguntas de la entrega
+        # 2. Obtener preguntas de la entrega (3. template ya procesado, con caché)
         logger.info(f"Obteniendo preguntas para entrega {entrega_id}")
-        entrega_data = encuestas_client.get_entrega_preguntas(entrega_id)
-        
-        # 2. Obtener preguntas de la entrega
-        logger.info(f"Obteniendo preguntas para entrega {entrega_id}")
-        entrega_data = encuestas_client.get_entrega_preguntas(entrega_id)
+        entrega_data, survey_template = survey_processor.get_survey_template(entrega_id)
         
         if not entrega_data or not entrega_data.get("success"):
             return {
@@ -214,9 +248,6 @@ async def process_audio_survey_complete(
                 "s3_url": s3_url
             }
         
-        # 3. Procesar template de la encuesta
-        survey_template = encuestas_client.process_survey_template(entrega_data)
-        
         # 4. Transcribir audio con Whisper
         logger.info(f"Transcribiendo audio con Whisper...")
         transcribed_text = audio_service.transcribe_audio(audio_bytes, filename)
@@ -304,7 +335,7 @@ async def process_audio_survey_complete(
             "error": str(e)
         }
 
-async def upload_audio_to_s3(audio_bytes: bytes, key: str, user_id: str, filename: str) -> str:
+def upload_audio_to_s3(audio_bytes: bytes, key: str, user_id: str, filename: str) -> str:
     """
     Subir archivo de audio a S3
     """
@@ -322,7 +353,7 @@ async def upload_audio_to_s3(audio_bytes: bytes, key: str, user_id: str, filenam
         logger.error(f"Error subiendo audio a S3: {e}")
         return ""
 
-async def send_notification(fcm_token: str, title: str, body: str, data: dict = None):
+def send_notification(fcm_token: str, title: str, body: str, data: dict = None):
     """
     Enviar notificación push
     """
@@ -376,33 +407,4 @@ async def get_supported_formats():
     """
     Obtener formatos de audio soportados
     """
-    return {
-        "supported_formats": [
-            {
-                "extension": ".mp3",
-                "description": "MP3 Audio"
-            },
-            {
-                "extension": ".wav", 
-                "description": "WAV Audio"
-            },
-            {
-                "extension": ".m4a",
-                "description": "M4A Audio" 
-            },
-            {
-                "extension": ".flac",
-                "description": "FLAC Audio"
-            },
-            {
-                "extension": ".ogg",
-                "description": "OGG Audio"
-            },
-            {
-                "extension": ".webm",
-                "description": "WebM Audio"
-            }
-        ],
-        "max_file_size": "25MB",
-        "recommended_format": "mp3 o wav para mejor compatibilidad"
-    }
\ No newline at end of file
+    return Response(_FORMATS_BYTES, media_type="application/json")
\ No newline at end of file
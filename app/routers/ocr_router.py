@@ -3,6 +3,7 @@ Router para endpoints de OCR y procesamiento de encuestas
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, BackgroundTasks, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import cv2
 import numpy as np
@@ -50,7 +51,7 @@ async def procesar_encuesta_con_notificaciones(
         # Leer imagen
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = await run_in_threadpool(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             logger.error("Error: No se pudo decodificar la imagen")
@@ -63,12 +64,13 @@ async def procesar_encuesta_con_notificaciones(
         
         # Enviar notificación de procesamiento iniciado
         if firebase_service.is_firebase_available():
-            firebase_service.send_processing_notification(fcm_token, user_id)
+            await run_in_threadpool(firebase_service.send_processing_notification, fcm_token, user_id)
         
         # Iniciar procesamiento en segundo plano
+        # (la imagen no se vuelve a usar en esta request, se pasa sin copiar)
         background_tasks.add_task(
             process_survey_background,
-            image.copy(),
+            image,
             fcm_token,
             user_id,
             file.filename
@@ -92,7 +94,8 @@ async def procesar_encuesta_con_notificaciones(
         logger.error(f"HTTP EXCEPTION: {he.detail}")
         # Enviar notificación de error inmediato
         if firebase_service.is_firebase_available():
-            firebase_service.send_ocr_error_notification(
+            await run_in_threadpool(
+                firebase_service.send_ocr_error_notification,
                 fcm_token, user_id, he.detail, "request_validation"
             )
         raise he
@@ -103,7 +106,8 @@ async def procesar_encuesta_con_notificaciones(
         
         # Enviar notificación de error inmediato
         if firebase_service.is_firebase_available():
-            firebase_service.send_ocr_error_notification(
+            await run_in_threadpool(
+                firebase_service.send_ocr_error_notification,
                 fcm_token, user_id, str(e), "request_validation"
             )
         
@@ -112,9 +116,12 @@ async def procesar_encuesta_con_notificaciones(
             detail=f"Error procesando request: {str(e)}"
         )
 
-async def process_survey_background(image, fcm_token, user_id, filename):
+def process_survey_background(image, fcm_token, user_id, filename):
     """
     Función para procesamiento en segundo plano
+    
+    Es síncrona a propósito: BackgroundTasks la ejecuta en el threadpool y las
+    llamadas bloqueantes (S3, Gemini, BD, Firebase) no detienen el event loop.
     """
     logger.info(f"Iniciando procesamiento background para user: {user_id}")
     
@@ -233,7 +240,7 @@ async def get_user_ocr_history(user_id: str, limit: int = 10):
     try:
         logger.info(f"Consultando historial OCR para usuario: {user_id}")
         
-        result = database_service.get_ocr_records_by_user(user_id, limit)
+        result = await run_in_threadpool(database_service.get_ocr_records_by_user, user_id, limit)
         
         if result['success']:
             return JSONResponse(
@@ -282,7 +289,7 @@ async def procesar_encuesta_ocr(
         # Leer imagen
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = await run_in_threadpool(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             raise HTTPException(
@@ -291,7 +298,7 @@ async def procesar_encuesta_ocr(
             )
         
         # Procesar imagen completa automáticamente
-        resultado = survey_processor.process_survey_image(image)
+        resultado = await run_in_threadpool(survey_processor.process_survey_image, image)
         
         if not resultado.get("success", False):
             return JSONResponse(
@@ -350,7 +357,7 @@ async def extraer_texto(file: UploadFile = File(...)):
         # Leer imagen
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = await run_in_threadpool(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             raise HTTPException(
@@ -359,7 +366,7 @@ async def extraer_texto(file: UploadFile = File(...)):
             )
         
         # Extraer texto con OCR
-        resultado = gemini_ocr.extract_text(image)
+        resultado = await run_in_threadpool(gemini_ocr.extract_text, image)
         
         return JSONResponse(
             status_code=200,
@@ -393,7 +400,7 @@ async def analizar_estructura(file: UploadFile = File(...)):
         # Leer imagen
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = await run_in_threadpool(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             raise HTTPException(
@@ -402,7 +409,7 @@ async def analizar_estructura(file: UploadFile = File(...)):
             )
         
         # Analizar estructura con OCR
-        resultado = gemini_ocr.analyze_form_structure(image)
+        resultado = await run_in_threadpool(gemini_ocr.analyze_form_structure, image)
         
         return JSONResponse(
             status_code=200,
@@ -437,7 +444,7 @@ async def extraer_manuscrito(file: UploadFile = File(...)):
         # Leer imagen
         contents = await file.read()
         nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        image = await run_in_threadpool(cv2.imdecode, nparr, cv2.IMREAD_COLOR)
         
         if image is None:
             raise HTTPException(
@@ -446,7 +453,7 @@ async def extraer_manuscrito(file: UploadFile = File(...)):
             )
         
         # Extraer texto manuscrito con OCR
-        resultado = gemini_ocr.extract_handwritten_text(image)
+        resultado = await run_in_threadpool(gemini_ocr.extract_handwritten_text, image)
         
         return JSONResponse(
             status_code=200,
@@ -3,8 +3,10 @@ Router para endpoints de reportes y KPIs
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import logging
+import time
 
 from app.services.reports_service import reports_service
 
@@ -13,6 +15,15 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/reportes", tags=["Reportes"])
 
+def _cache_headers(started_at):
+    """
+    Cabeceras para respuestas armadas con datos degradados (base caída):
+    no-store evita que la caché de respuestas guarde ceros por todo el TTL
+    """
+    if reports_service.had_errors_since(started_at):
+        return {"Cache-Control": "no-store"}
+    return None
+
 @router.get("/kpi")
 async def get_kpi_report():
     """
@@ -25,12 +36,14 @@ async def get_kpi_report():
     try:
         logger.info("Solicitando reporte de KPIs")
         
+        started_at = time.monotonic()
         # Generar reporte completo
-        result = reports_service.get_kpi_report()
+        result = await run_in_threadpool(reports_service.get_kpi_report)
         
         if result['success']:
             return JSONResponse(
                 status_code=200,
+                headers=_cache_headers(started_at),
                 content={
                     "success": True,
                     "message": "Reporte de KPIs generado exitosamente",
@@ -62,10 +75,12 @@ async def get_usuarios_stats():
     Obtener solo estadísticas de usuarios
     """
     try:
-        usuarios_stats = reports_service.get_usuarios_stats()
+        started_at = time.monotonic()
+        usuarios_stats = await run_in_threadpool(reports_service.get_usuarios_stats)
         
         return JSONResponse(
             status_code=200,
+            headers=_cache_headers(started_at),
             content={
                 "success": True,
                 "data": usuarios_stats
@@ -85,10 +100,12 @@ async def get_respuestas_stats():
     Obtener solo estadísticas de respuestas
     """
     try:
-        respuestas_stats = reports_service.get_respuestas_stats()
+        started_at = time.monotonic()
+        respuestas_stats = await run_in_threadpool(reports_service.get_respuestas_stats)
         
         return JSONResponse(
             status_code=200,
+            headers=_cache_headers(started_at),
             content={
                 "success": True,
                 "data": respuestas_stats
@@ -108,10 +125,12 @@ async def get_top_usuarios():
     Obtener top 5 usuarios más activos
     """
     try:
-        top_usuarios = reports_service.get_top_usuarios_activos()
+        started_at = time.monotonic()
+        top_usuarios = await run_in_threadpool(reports_service.get_top_usuarios_activos)
         
         return JSONResponse(
             status_code=200,
+            headers=_cache_headers(started_at),
             content={
                 "success": True,
                 "data": {
@@ -135,9 +154,9 @@ async def health_check():
     """
     try:
         # Probar conexión básica
-        reports_service._ensure_connection()
+        await run_in_threadpool(reports_service._ensure_connection)
         
-        if reports_service.connection and not reports_service.connection.closed:
+        if reports_service.is_connected():
             return JSONResponse(
                 status_code=200,
                 content={
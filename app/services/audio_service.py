@@ -34,6 +34,7 @@ class AudioService:
             self.generation_config = genai.types.GenerationConfig(
                 temperature=0.1,
                 max_output_tokens=2000,
+                response_mime_type="application/json",
             )
             
             self.gemini_model = genai.GenerativeModel(
@@ -4,9 +4,11 @@ Servicio para manejo de base de datos PostgreSQL
 
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import uuid
 import os
 import json
+import threading
 from dotenv import load_dotenv
 import logging
 
@@ -25,29 +27,69 @@ class DatabaseService:
         if not self.database_url:
             raise ValueError("DATABASE_URL no encontrada en variables de entorno")
         
-        self.connection = None
-        self._connect()
+        # Pool de conexiones: los registros OCR/audio se escriben desde hilos del
+        # threadpool y cada transacción necesita su propia conexión.
+        # El pool se crea en el primer uso (_ensure_connection)
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', '5'))
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        # getconn() falla si el pool se agota; el semáforo hace esperar en su lugar
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
     
     def _connect(self):
         """
-        Establecer conexión con la base de datos
+        Establecer pool de conexiones con la base de datos
         """
         try:
-            self.connection = psycopg2.connect(
+            self.pool = ThreadedConnectionPool(
+                1,
+                self.pool_size,
                 self.database_url,
                 cursor_factory=RealDictCursor
             )
             logger.info("Conexión exitosa a PostgreSQL")
         except Exception as e:
             logger.error(f"Error conectando a PostgreSQL: {e}")
-            self.connection = None
+            self.pool = None
     
     def _ensure_connection(self):
         """
-        Asegurar que la conexión esté activa
+        Asegurar que el pool de conexiones esté activo
         """
-        if not self.connection or self.connection.closed:
-            self._connect()
+        with self._pool_lock:
+            if not self.pool or self.pool.closed:
+                self._connect()
+    
+    def is_connected(self):
+        """
+        Verificar si hay pool de conexiones disponible
+        """
+        return self.pool is not None and not self.pool.closed
+    
+    def _execute(self, query, params, fetch_all=False):
+        """
+        Ejecutar consulta en una transacción con una conexión tomada del pool
+        """
+        with self._pool_slots:
+            connection = self.pool.getconn()
+            try:
+                cursor = connection.cursor()
+                cursor.execute(query, params)
+                result = cursor.fetchall() if fetch_all else cursor.fetchone()
+                connection.commit()
+                cursor.close()
+                self.pool.putconn(connection)
+                return result
+            except Exception:
+                # Descartar la conexión (cerrarla aborta solo esta transacción)
+                self.pool.putconn(connection, close=True)
+                raise
+    
+    def warm_up(self):
+        """
+        Abrir la conexión de antemano (al arrancar la aplicación)
+        """
+        self._ensure_connection()
     
     def insert_ocr_record(self, user_id, contenido, url=None):
         """
@@ -64,7 +106,7 @@ class DatabaseService:
         try:
             self._ensure_connection()
             
-            if not self.connection:
+            if not self.is_connected():
                 return {
                     "success": False,
                     "record_id": None,
@@ -76,19 +118,13 @@ class DatabaseService:
             if isinstance(url, dict):
                 actual_url = url.get('url', str(url))
             
-            cursor = self.connection.cursor()
-            
             insert_query = """
                 INSERT INTO ocr (user_id, contenido, url, created_at)
                 VALUES (%s, %s, %s, NOW())
                 RETURNING id, created_at
             """
             
-            cursor.execute(insert_query, (str(user_id), contenido, actual_url))
-            result = cursor.fetchone()
-            
-            self.connection.commit()
-            cursor.close()
+            result = self._execute(insert_query, (str(user_id), contenido, actual_url))
             
             logger.info(f"Registro OCR insertado exitosamente")
             
@@ -101,9 +137,6 @@ class DatabaseService:
         except Exception as e:
             logger.error(f"Error insertando registro OCR: {e}")
             
-            if self.connection:
-                self.connection.rollback()
-            
             return {
                 "success": False,
                 "record_id": None,
@@ -125,7 +158,7 @@ class DatabaseService:
         try:
             self._ensure_connection()
             
-            if not self.connection:
+            if not self.is_connected():
                 return {
                     "success": False,
                     "record_id": None,
@@ -143,8 +176,6 @@ class DatabaseService:
                 actual_s3_url = s3_url.get('url', str(s3_url))
                 logger.info(f"DEBUG - Extracted URL from dict: {actual_s3_url}")
             
-            cursor = self.connection.cursor()
-            
             # Usar tabla existente 'audio' sin columna contenido - Supabase genera el ID automáticamente
             insert_query = """
                 INSERT INTO audio (user_id, url, created_at)
@@ -152,13 +183,9 @@ class DatabaseService:
                 RETURNING id, created_at
             """
             
-            cursor.execute(insert_query, (
+            result = self._execute(insert_query, (
                 str(user_id), str(actual_s3_url)
             ))
-            result = cursor.fetchone()
-            
-            self.connection.commit()
-            cursor.close()
             
             logger.info(f"Registro AUDIO insertado exitosamente")
             
@@ -170,8 +197,6 @@ class DatabaseService:
             
         except Exception as e:
             logger.error(f"Error insertando registro AUDIO: {e}")
-            if self.connection:
-                self.connection.rollback()
             
             return {
                 "success": False,
@@ -193,15 +218,13 @@ class DatabaseService:
         try:
             self._ensure_connection()
             
-            if not self.connection:
+            if not self.is_connected():
                 return {
                     "success": False,
                     "records": [],
                     "error": "No se pudo establecer conexión con la base de datos"
                 }
             
-            cursor = self.connection.cursor()
-            
             select_query = """
                 SELECT id, user_id, contenido, url, created_at
                 FROM ocr
@@ -210,9 +233,7 @@ class DatabaseService:
                 LIMIT %s
             """
             
-            cursor.execute(select_query, (user_id, limit))
-            records = cursor.fetchall()
-            cursor.close()
+            records = self._execute(select_query, (user_id, limit), fetch_all=True)
             
             # Convertir registros a lista de diccionarios
             result_records = []
@@ -243,8 +264,8 @@ class DatabaseService:
         """
         Cerrar conexión con la base de datos
         """
-        if self.connection and not self.connection.closed:
-            self.connection.close()
+        if self.is_connected():
+            self.pool.closeall()
             logger.info("Conexión a PostgreSQL cerrada")
 
 # Instancia global del servicio
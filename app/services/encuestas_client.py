@@ -2,9 +2,10 @@
 Cliente para la API de encuestas.sw2ficct.lat
 """
 
-import requests
+import httpx
 import json
 import os
+from collections.abc import Hashable
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,11 +16,18 @@ class EncuestasAPIClient:
         Inicializar cliente de la API de encuestas
         """
         self.base_url = base_url or os.getenv('ENCUESTAS_API_URL', 'https://encuestas.sw2ficct.lat/api')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-            'Accept': 'application/json'
-        })
+        # Cliente compartido con HTTP/2: GET de plantilla y POST de respuestas
+        # se multiplexan sobre la misma conexión TLS
+        self.session = httpx.Client(
+            http2=True,
+            headers={
+                'Content-Type': 'application/json',
+                'Accept': 'application/json'
+            },
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=float(os.getenv('ENCUESTAS_API_TIMEOUT', '30')),
+            follow_redirects=True
+        )
     
     def get_entrega_preguntas(self, entrega_id):
         """
@@ -55,7 +63,7 @@ class EncuestasAPIClient:
                     'status_code': response.status_code
                 }
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 'success': False,
                 'error': f'Error de conexión: {str(e)}',
@@ -83,6 +91,15 @@ class EncuestasAPIClient:
                     {"preguntaId": "uuid", "texto": "respuesta"}  # Para preguntas abiertas
                 ]
         """
+        # Sin respuestas no hay nada que guardar: evitar el viaje a la API
+        if not respuestas:
+            return {
+                'success': False,
+                'error': 'No hay respuestas para guardar',
+                'entrega_id': entrega_id,
+                'validation_error': True
+            }
+        
         try:
             url = f"{self.base_url}/entrega/{entrega_id}/respuestas"
             payload = {"respuestas": respuestas}
@@ -123,7 +140,7 @@ class EncuestasAPIClient:
                     'status_code': response.status_code
                 }
                 
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             return {
                 'success': False,
                 'error': f'Error de conexión: {str(e)}',
@@ -195,6 +212,23 @@ class EncuestasAPIClient:
         else:
             preguntas_ocr = ocr_responses
         
+        # Índices de la plantilla: una pasada en vez de recorrerla por cada respuesta
+        # (setdefault conserva la primera coincidencia, como la búsqueda lineal)
+        # Valores no hashables (listas, dicts) no se indexan: se buscan recorriendo
+        preguntas = template.get('preguntas', [])
+        preguntas_por_id = {}
+        preguntas_por_orden = {}
+        for p in preguntas:
+            if isinstance(p.get('id'), Hashable):
+                preguntas_por_id.setdefault(p.get('id'), p)
+            if isinstance(p.get('orden'), Hashable):
+                preguntas_por_orden.setdefault(p.get('orden'), p)
+        
+        def buscar_pregunta(indice, campo, valor):
+            if isinstance(valor, Hashable):
+                return indice.get(valor)
+            return next((p for p in preguntas if p.get(campo) == valor), None)
+        
         # Mapear por orden de pregunta o por pregunta_id
         for pregunta_ocr in preguntas_ocr:
             if not pregunta_ocr.get('respuesta'):
@@ -206,18 +240,11 @@ class EncuestasAPIClient:
             # Primero intentar por pregunta_id (para audio)
             pregunta_id = pregunta_ocr.get('pregunta_id')
             if pregunta_id:
-                for p in template.get('preguntas', []):
-                    if p.get('id') == pregunta_id:
-                        pregunta_template = p
-                        break
+                pregunta_template = buscar_pregunta(preguntas_por_id, 'id', pregunta_id)
             
             # Si no encontró por pregunta_id, intentar por orden (para OCR tradicional)
             if not pregunta_template:
-                orden_ocr = pregunta_ocr.get('orden')
-                for p in template.get('preguntas', []):
-                    if p.get('orden') == orden_ocr:
-                        pregunta_template = p
-                        break
+                pregunta_template = buscar_pregunta(preguntas_por_orden, 'orden', pregunta_ocr.get('orden'))
             
             if not pregunta_template:
                 continue
@@ -235,44 +262,65 @@ class EncuestasAPIClient:
                 # Pregunta con opciones - manejar múltiples respuestas
                 respuestas_list = respuesta if isinstance(respuesta, list) else [respuesta]
                 
+                # Opciones por id normalizado (primera coincidencia, como el recorrido lineal);
+                # la clave es siempre str, así ids con listas o dicts no rompen el índice
+                opciones_plantilla = pregunta_template.get('opciones') or []
+                opciones = [
+                    opcion for opcion in opciones_plantilla
+                    if isinstance(opcion, dict) and opcion.get('id') is not None
+                ]
+                opciones_por_id = {}
+                for opcion in opciones:
+                    opciones_por_id.setdefault(str(opcion['id']).lower(), opcion)
+                
                 for resp_item in respuestas_list:
+                    # Normalizar una vez por respuesta, no por cada opción comparada
+                    resp_texto = str(resp_item)
+                    resp_lower = resp_texto.lower()
+                    
                     # Si la respuesta es un UUID (opcionId directo), buscar por ID
                     encontrada = False
-                    for opcion in pregunta_template['opciones']:
-                        if str(opcion['id']).lower() == str(resp_item).lower():
-                            api_responses.append({
-                                'preguntaId': pregunta_template['id'],
-                                'opcionId': opcion['id']
-                            })
-                            encontrada = True
-                            break
+                    opcion = opciones_por_id.get(resp_lower)
+                    if opcion is not None:
+                        api_responses.append({
+                            'preguntaId': pregunta_template['id'],
+                            'opcionId': opcion['id']
+                        })
+                        encontrada = True
                     
                     if not encontrada:
                         # Si no es UUID válido, intentar por número (1, 2, 3...)
-                        if str(resp_item).isdigit():
-                            option_index = int(resp_item) - 1  # Convertir a índice 0-based
-                            if 0 <= option_index < len(pregunta_template['opciones']):
-                                api_responses.append({
-                                    'preguntaId': pregunta_template['id'],
-                                    'opcionId': pregunta_template['opciones'][option_index]['id']
-                                })
-                                encontrada = True
+                        # isdecimal: isdigit acepta '²', que int() rechaza
+                        if resp_texto.isdecimal():
+                            option_index = int(resp_texto) - 1  # Convertir a índice 0-based
+                            if 0 <= option_index < len(opciones_plantilla):
+                                opcion = opciones_plantilla[option_index]
+                                if isinstance(opcion, dict) and opcion.get('id') is not None:
+                                    api_responses.append({
+                                        'preguntaId': pregunta_template['id'],
+                                        'opcionId': opcion['id']
+                                    })
+                                    encontrada = True
                     
                     if not encontrada:
                         # Si no es número ni UUID, buscar por texto como antes
-                        for opcion in pregunta_template['opciones']:
-                            if opcion['texto'].lower() in str(resp_item).lower():
+                        for opcion in opciones:
+                            texto = opcion.get('texto')
+                            if isinstance(texto, str) and texto.lower() in resp_lower:
                                 api_responses.append({
                                     'preguntaId': pregunta_template['id'],
                                     'opcionId': opcion['id']
                                 })
                                 break
         
-        print(f"\nRESULTADO MAPEO:")
-        print(f"  Total respuestas mapeadas: {len(api_responses)}")
-        for i, resp in enumerate(api_responses):
-            print(f"  Respuesta {i+1}: {resp}")
-        print("--- FIN MAPEO ---\n")
+        # Un solo print con todo el resumen en vez de uno por respuesta
+        lineas = [f"  Respuesta {i+1}: {resp}" for i, resp in enumerate(api_responses)]
+        print(
+            f"\nRESULTADO MAPEO:\n"
+            f"  Total respuestas mapeadas: {len(api_responses)}\n"
+            + "".join(f"{linea}\n" for linea in lineas)
+            + "--- FIN MAPEO ---\n"
+        )
         
         return api_responses
     
@@ -14,6 +14,9 @@ from dotenv import load_dotenv
 # Cargar variables de entorno
 load_dotenv()
 
+# Calidad JPEG de las imágenes enviadas a Gemini
+GEMINI_JPEG_QUALITY = 90
+
 class GeminiOCRService:
     def __init__(self, api_key=None):
         """
@@ -33,6 +36,13 @@ class GeminiOCRService:
                 max_output_tokens=2000,
             )
             
+            # Para respuestas JSON: sin bloques markdown ni texto extra que generar
+            self.json_generation_config = genai.types.GenerationConfig(
+                temperature=0.1,
+                max_output_tokens=2000,
+                response_mime_type="application/json",
+            )
+            
             self.model = genai.GenerativeModel(
                 'gemini-2.5-flash', 
                 generation_config=self.generation_config
@@ -52,12 +62,20 @@ class GeminiOCRService:
             return {"error": "OCR no disponible"}
         
         try:
+            # Imagen en blanco: no hay texto que pedirle a Gemini
+            if self._is_blank_image(image):
+                return {
+                    "success": True,
+                    "text": "",
+                    "error": None
+                }
+            
             # Optimizar imagen si es muy grande
-            pil_image = self._prepare_image(image)
+            image_part = self.prepare_image_part(image)
             
             prompt = "Extrae todo el texto visible de esta imagen, IGNORANDO cualquier código QR. Responde solo con el texto extraído, sin explicaciones adicionales."
             
-            response = self.model.generate_content([prompt, pil_image])
+            response = self.model.generate_content([prompt, image_part])
             
             return {
                 "success": True,
@@ -80,7 +98,7 @@ class GeminiOCRService:
             return {"error": "OCR no disponible"}
         
         try:
-            pil_image = self._prepare_image(image)
+            image_part = self.prepare_image_part(image)
             
             prompt = f"""
 Extrae el texto de esta imagen y completa esta encuesta. IGNORA cualquier código QR que veas en la imagen.
@@ -106,7 +124,10 @@ Para preguntas abiertas: usar el texto extraído del campo
 Responde SOLO con el JSON completado:
             """
             
-            response = self.model.generate_content([prompt, pil_image])
+            response = self.model.generate_content(
+                [prompt, image_part],
+                generation_config=self.json_generation_config
+            )
             
             # Limpiar respuesta
             response_text = response.text.strip()
@@ -148,7 +169,7 @@ Responde SOLO con el JSON completado:
             return {"error": "OCR no disponible"}
         
         try:
-            pil_image = self._prepare_image(image)
+            image_part = self.prepare_image_part(image)
             
             prompt = """
 Analiza esta imagen de formulario y identifica:
@@ -171,7 +192,10 @@ Responde en formato JSON:
 }
             """
             
-            response = self.model.generate_content([prompt, pil_image])
+            response = self.model.generate_content(
+                [prompt, image_part],
+                generation_config=self.json_generation_config
+            )
             
             # Limpiar respuesta
             response_text = response.text.strip()
@@ -212,7 +236,15 @@ Responde en formato JSON:
             return {"error": "OCR no disponible"}
         
         try:
-            pil_image = self._prepare_image(image)
+            # Imagen en blanco: no hay texto que pedirle a Gemini
+            if self._is_blank_image(image):
+                return {
+                    "success": True,
+                    "handwritten_text": "",
+                    "error": None
+                }
+            
+            image_part = self.prepare_image_part(image)
             
             prompt = """
 Identifica y extrae SOLAMENTE el texto manuscrito/escrito a mano de esta imagen.
@@ -221,7 +253,7 @@ Si hay múltiples campos de texto manuscrito, sepáralos claramente.
 Responde solo con el texto manuscrito extraído.
             """
             
-            response = self.model.generate_content([prompt, pil_image])
+            response = self.model.generate_content([prompt, image_part])
             
             return {
                 "success": True,
@@ -236,11 +268,46 @@ Responde solo con el texto manuscrito extraído.
                 "error": str(e)
             }
     
+    def _is_blank_image(self, image):
+        """
+        Detectar imágenes sin contenido (superficie uniforme, sin texto)
+        
+        Chequeo barato sobre los píxeles que evita una llamada completa a Gemini.
+        No se mide la fracción de tinta: en una página completa una sola línea
+        manuscrita ocupa mucho menos del 1% de los píxeles.
+        """
+        if not isinstance(image, np.ndarray) or image.size == 0:
+            return False
+        
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        
+        # Sin variación de intensidad: no puede haber trazos
+        return gray.std() < 5
+    
+    def _downscale_array(self, image, max_size=1024):
+        """
+        Reducir imagen OpenCV para que su lado mayor no supere max_size
+        """
+        height, width = image.shape[:2]
+        scale = max_size / max(height, width)
+        if scale >= 1:
+            return image
+        
+        return cv2.resize(
+            image,
+            (max(1, round(width * scale)), max(1, round(height * scale))),
+            interpolation=cv2.INTER_AREA
+        )
+    
     def _prepare_image(self, image):
         """
         Preparar imagen para procesamiento (convertir y optimizar)
         """
         if isinstance(image, np.ndarray):
+            # Reducir antes de convertir: la conversión de color y la copia a PIL
+            # trabajan sobre la imagen pequeña en vez de la foto completa
+            image = self._downscale_array(image)
+            
             # Convertir de OpenCV a PIL
             if len(image.shape) == 3:
                 image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -256,6 +323,42 @@ Responde solo con el texto manuscrito extraído.
         
         return pil_image
     
+    def prepare_image_part(self, image):
+        """
+        Preparar imagen como parte JPEG lista para enviar a Gemini
+        
+        Con una imagen PIL el SDK la recodifica como WebP sin pérdida, que es
+        lento y pesado; un JPEG de buena calidad alcanza para OCR.
+        """
+        # Ya preparada (por ejemplo, en paralelo por el llamador)
+        if isinstance(image, dict):
+            return image
+        
+        # OpenCV codifica BGR directamente: sin conversión a RGB ni copia a PIL
+        if isinstance(image, np.ndarray):
+            success, buffer = cv2.imencode(
+                '.jpg',
+                self._downscale_array(image),
+                [cv2.IMWRITE_JPEG_QUALITY, GEMINI_JPEG_QUALITY]
+            )
+            if success:
+                return {
+                    "mime_type": "image/jpeg",
+                    "data": buffer.tobytes()
+                }
+        
+        pil_image = self._prepare_image(image)
+        if pil_image.mode not in ("RGB", "L"):
+            pil_image = pil_image.convert("RGB")
+        
+        buffer = io.BytesIO()
+        pil_image.save(buffer, format="JPEG", quality=GEMINI_JPEG_QUALITY)
+        
+        return {
+            "mime_type": "image/jpeg",
+            "data": buffer.getvalue()
+        }
+    
     def batch_process_images(self, images, operation="extract_text"):
         """
         Procesar múltiples imágenes en lote
@@ -6,6 +6,18 @@ import cv2
 import numpy as np
 from PIL import Image
 import re
+from typing import NamedTuple
+
+class BBox(NamedTuple):
+    """
+    Caja delimitadora de un código QR (acceso por atributo, sin dict por QR)
+    """
+    x: int
+    y: int
+    width: int
+    height: int
+    x2: int
+    y2: int
 
 class QRCodeService:
     def __init__(self):
@@ -13,12 +25,19 @@ class QRCodeService:
         Inicializar servicio de QR
         """
         self.qr_detector = cv2.QRCodeDetector()
+        # En orden de prioridad: el primero con un ID válido decide el resultado
         self.qr_patterns = {
-            'entrega_id': r'entregaId[=:]([a-f0-9\-]+)',
-            'url_entrega': r'entrega[/\?]([a-f0-9\-]+)',
-            'uuid': r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})',
-            'simple_id': r'([a-zA-Z0-9\-_]{10,50})'
+            'entrega_id': r'entregaId[=:](?P<entrega_id>[a-f0-9\-]+)',
+            'url_entrega': r'entrega[/\?](?P<url_entrega>[a-f0-9\-]+)',
+            'uuid': r'(?P<uuid>[a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})',
+            'simple_id': r'(?P<simple_id>[a-zA-Z0-9\-_]{10,50})'
         }
+        # Un solo patrón combinado: el texto del QR se recorre una sola vez.
+        # El lookahead evalúa todas las posiciones, igual que un findall por patrón
+        self._combined_pattern = re.compile(
+            '(?=' + '|'.join(self.qr_patterns.values()) + ')',
+            re.IGNORECASE
+        )
     
     def detect_qr_codes(self, image):
         """
@@ -29,7 +48,8 @@ class QRCodeService:
             if len(image.shape) == 3:
                 gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             else:
-                gray = image.copy()
+                # detectAndDecode no modifica la entrada, no hace falta copiarla
+                gray = image
             
             # Detectar y decodificar códigos QR usando OpenCV
             data, bbox, _ = self.qr_detector.detectAndDecode(gray)
@@ -82,28 +102,32 @@ class QRCodeService:
         y = int(min(y_coords))
         x2 = int(max(x_coords))
         y2 = int(max(y_coords))
-        w = x2 - x
-        h = y2 - y
         
-        return {
-            'x': x, 'y': y,
-            'width': w, 'height': h,
-            'x2': x2, 'y2': y2
-        }
+        return BBox(x, y, x2 - x, y2 - y, x2, y2)
     
     def extract_entrega_id(self, qr_data):
         """
         Extraer ID de entrega del contenido del QR
         """
         try:
-            # Probar diferentes patrones para encontrar el ID de entrega
-            for pattern_name, pattern in self.qr_patterns.items():
-                matches = re.findall(pattern, qr_data, re.IGNORECASE)
-                if matches:
-                    # Validar que parece un UUID válido
-                    potential_id = matches[0]
-                    if self.is_valid_entrega_id(potential_id):
-                        return potential_id
+            # Recorrer el QR una vez guardando la primera coincidencia de cada patrón
+            pattern_names = list(self.qr_patterns)
+            first_matches = {}
+            for match in self._combined_pattern.finditer(qr_data):
+                pattern_name = match.lastgroup
+                if pattern_name in first_matches:
+                    continue
+                first_matches[pattern_name] = match.group(pattern_name)
+                # El patrón prioritario ya apareció, no hace falta seguir
+                if pattern_name == pattern_names[0] and self.is_valid_entrega_id(first_matches[pattern_name]):
+                    break
+            
+            # Probar los patrones en orden de prioridad
+            for pattern_name in pattern_names:
+                potential_id = first_matches.get(pattern_name)
+                # Validar que parece un UUID válido
+                if potential_id and self.is_valid_entrega_id(potential_id):
+                    return potential_id
             
             # Si no encuentra patrón, verificar si toda la cadena es un ID
             if self.is_valid_entrega_id(qr_data):
@@ -144,14 +168,12 @@ class QRCodeService:
             if bbox is None:
                 continue
                 
-            x, y, w, h = bbox['x'], bbox['y'], bbox['width'], bbox['height']
-            
             # Expandir un poco el área para asegurar eliminación completa
             padding = 10
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            x2 = min(image.shape[1], bbox['x2'] + padding)
-            y2 = min(image.shape[0], bbox['y2'] + padding)
+            x = max(0, bbox.x - padding)
+            y = max(0, bbox.y - padding)
+            x2 = min(image.shape[1], bbox.x2 + padding)
+            y2 = min(image.shape[0], bbox.y2 + padding)
             
             # Rellenar con color promedio del área circundante
             surrounding_area = self._get_surrounding_color(image, x, y, x2, y2)
@@ -173,7 +195,7 @@ class QRCodeService:
         bottom = min(h, y2 + sample_size)
         
         # Extraer área de muestreo excluyendo el QR
-        mask = np.ones((bottom - top, right - left), dtype=np.uint8) * 255
+        mask = np.full((bottom - top, right - left), 255, dtype=np.uint8)
         
         # Excluir área del QR del promedio
         qr_rel_x1 = max(0, x1 - left)
@@ -204,7 +226,7 @@ class QRCodeService:
         # Si hay múltiples, elegir el primero (o el más grande si tienen bbox)
         best_qr = entrega_qrs[0]
         if best_qr.get('bbox'):
-            best_qr = max(entrega_qrs, key=lambda x: x['bbox']['width'] * x['bbox']['height'] if x.get('bbox') else 0)
+            best_qr = max(entrega_qrs, key=lambda x: x['bbox'].width * x['bbox'].height if x.get('bbox') else 0)
         
         return {
             'entrega_id': best_qr['entrega_id'],
@@ -3,9 +3,14 @@ Servicio de reportes y KPIs para la plataforma de encuestas
 """
 
 import psycopg2
+from psycopg2.extensions import cursor as TupleCursor
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 import os
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -28,7 +33,12 @@ class ReportsService:
         if not self.database_url:
             raise ValueError("RAILWAY_DATABASE_URL no está configurada en el archivo .env")
         
-        self.connection = None
+        # Pool de conexiones: las consultas de KPIs se ejecutan en paralelo
+        self.pool_size = int(os.getenv('REPORTS_DB_POOL_SIZE', '5'))
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        # getconn() falla si el pool se agota; el semáforo hace esperar en su lugar
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
         
         # Configurar MongoDB para usuarios
         self.mongo_url = os.getenv('MONGODB_URL')
@@ -37,6 +47,15 @@ class ReportsService:
         
         self.mongo_client = None
         self.mongo_db = None
+        self._mongo_lock = threading.Lock()
+        # Tras un fallo no se reintenta hasta pasado este momento (time.monotonic)
+        self._mongo_retry_at = 0
+        self.mongo_retry_seconds = int(os.getenv('MONGODB_RETRY_SECONDS', '60'))
+        self.mongo_timeout_ms = int(os.getenv('MONGODB_TIMEOUT_MS', '3000'))
+        
+        # Último fallo de una fuente de datos (time.monotonic): los reportes armados
+        # con datos vacíos por una caída no deben cachearse
+        self._last_error_at = 0.0
         
         # Configurar OpenAI
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
@@ -44,38 +63,114 @@ class ReportsService:
         if self.openai_api_key:
             self.openai_client = OpenAI(api_key=self.openai_api_key)
         
-        self._connect()
-        self._connect_mongo()
+        # Las conexiones se abren en el primer uso: importar el módulo no
+        # bloquea el arranque del worker esperando a PostgreSQL o MongoDB
     
     def _connect(self):
-        """Establecer conexión con la base de datos"""
+        """Establecer pool de conexiones con la base de datos"""
         try:
-            self.connection = psycopg2.connect(
+            self.pool = ThreadedConnectionPool(
+                1,
+                self.pool_size,
                 self.database_url,
                 cursor_factory=RealDictCursor
             )
             logger.info("Conexión exitosa a PostgreSQL para reportes")
         except Exception as e:
             logger.error(f"Error conectando a PostgreSQL: {e}")
-            self.connection = None
+            self.pool = None
     
     def _connect_mongo(self):
         """Establecer conexión con MongoDB"""
+        client = None
         try:
-            self.mongo_client = MongoClient(self.mongo_url)
-            self.mongo_db = self.mongo_client['sw2p2go_db']
-            # Probar la conexión
-            self.mongo_client.admin.command('ismaster')
+            client = MongoClient(
+                self.mongo_url,
+                serverSelectionTimeoutMS=self.mongo_timeout_ms
+            )
+            # Probar la conexión antes de publicarla a otros hilos
+            client.admin.command('ismaster')
+            self.mongo_client = client
+            self.mongo_db = client['sw2p2go_db']
             logger.info("Conexión exitosa a MongoDB para usuarios")
         except Exception as e:
             logger.error(f"Error conectando a MongoDB: {e}")
+            # Cerrar el cliente fallido: cada MongoClient mantiene hilos de monitoreo y sockets
+            if client is not None:
+                try:
+                    client.close()
+                except Exception:
+                    pass
             self.mongo_client = None
             self.mongo_db = None
+            self._mongo_retry_at = time.monotonic() + self.mongo_retry_seconds
     
     def _ensure_connection(self):
-        """Asegurar que la conexión esté activa"""
-        if not self.connection or self.connection.closed:
-            self._connect()
+        """Asegurar que el pool de conexiones esté activo"""
+        with self._pool_lock:
+            if not self.pool or self.pool.closed:
+                self._connect()
+    
+    def _ensure_mongo(self):
+        """
+        Asegurar que la conexión a MongoDB esté activa
+        
+        Si el último intento falló hace poco, o otro hilo está conectando, no
+        espera: el llamador ve mongo_db en None y sigue sin nombres de usuario.
+        """
+        if self.mongo_db is not None or time.monotonic() < self._mongo_retry_at:
+            return
+        
+        if not self._mongo_lock.acquire(blocking=False):
+            return
+        try:
+            if self.mongo_db is None:
+                self._connect_mongo()
+        finally:
+            self._mongo_lock.release()
+    
+    def warm_up(self):
+        """Abrir las conexiones de antemano (al arrancar la aplicación)"""
+        self._ensure_connection()
+        self._ensure_mongo()
+    
+    def _mark_error(self):
+        """Registrar que una consulta devolvió datos vacíos por un fallo"""
+        self._last_error_at = time.monotonic()
+    
+    def had_errors_since(self, started_at):
+        """
+        Indicar si alguna fuente de datos falló desde started_at (time.monotonic)
+        
+        Las consultas de un reporte corren en varios hilos, por eso se compara
+        por tiempo; un fallo de otra petición concurrente también cuenta.
+        """
+        return self._last_error_at >= started_at
+    
+    def is_connected(self):
+        """Verificar si hay pool de conexiones disponible"""
+        return self.pool is not None and not self.pool.closed
+    
+    def _fetch_all(self, query, cursor_factory=None):
+        """
+        Ejecutar consulta con una conexión tomada del pool
+        """
+        with self._pool_slots:
+            connection = self.pool.getconn()
+            try:
+                if cursor_factory:
+                    cursor = connection.cursor(cursor_factory=cursor_factory)
+                else:
+                    cursor = connection.cursor()
+                cursor.execute(query)
+                results = cursor.fetchall()
+                cursor.close()
+                self.pool.putconn(connection)
+                return results
+            except Exception:
+                # Descartar la conexión por si quedó en mal estado
+                self.pool.putconn(connection, close=True)
+                raise
     
     def execute_query(self, query, description=""):
         """
@@ -91,17 +186,43 @@ class ReportsService:
         try:
             self._ensure_connection()
             
-            if not self.connection:
+            if not self.is_connected():
                 logger.error("No se pudo establecer conexión con la base de datos")
+                self._mark_error()
                 return []
             
-            cursor = self.connection.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
-            cursor.close()
-            return results
+            return self._fetch_all(query)
         except Exception as e:
             logger.error(f"Error en consulta '{description}': {e}")
+            self._mark_error()
+            return []
+    
+    def execute_query_tuple(self, query, description=""):
+        """
+        Ejecutar consulta SQL devolviendo filas como tuplas
+        
+        Evita construir un RealDictRow por fila en consultas con muchas filas;
+        las columnas se leen por posición en el orden del SELECT.
+        
+        Args:
+            query: Consulta SQL
+            description: Descripción de la consulta
+            
+        Returns:
+            list: Resultados de la consulta (tuplas)
+        """
+        try:
+            self._ensure_connection()
+            
+            if not self.is_connected():
+                logger.error("No se pudo establecer conexión con la base de datos")
+                self._mark_error()
+                return []
+            
+            return self._fetch_all(query, cursor_factory=TupleCursor)
+        except Exception as e:
+            logger.error(f"Error en consulta '{description}': {e}")
+            self._mark_error()
             return []
     
     def get_usuarios_names(self, user_ids):
@@ -115,8 +236,11 @@ class ReportsService:
             dict: Mapeo de user_id -> nombre
         """
         try:
+            self._ensure_mongo()
+            
             if self.mongo_db is None:
                 logger.warning("No hay conexión a MongoDB")
+                self._mark_error()
                 return {}
             
             # Buscar usuarios en MongoDB por sus IDs
@@ -164,6 +288,7 @@ class ReportsService:
                 
         except Exception as e:
             logger.error(f"Error obteniendo nombres de usuarios desde MongoDB: {e}")
+            self._mark_error()
             return {}
     
     def get_usuarios_stats(self):
@@ -268,15 +393,16 @@ class ReportsService:
         ORDER BY total_preguntas DESC;
         """
         
-        tipos_result = self.execute_query(query_tipos, "Estadísticas de tipos de pregunta")
+        tipos_result = self.execute_query_tuple(query_tipos, "Estadísticas de tipos de pregunta")
         
+        # Columnas: tipo_pregunta, total_preguntas, porcentaje, encuestas_usando_tipo
         tipos_populares = []
-        for row in tipos_result:
+        for tipo, total, porcentaje, encuestas_usando in tipos_result:
             tipos_populares.append({
-                "tipo": row['tipo_pregunta'],
-                "total": row['total_preguntas'] or 0,
-                "porcentaje": round(float(row['porcentaje'] or 0), 1),
-                "encuestas_usando": row['encuestas_usando_tipo'] or 0
+                "tipo": tipo,
+                "total": total or 0,
+                "porcentaje": round(float(porcentaje or 0), 1),
+                "encuestas_usando": encuestas_usando or 0
             })
         
         return tipos_populares
@@ -297,24 +423,25 @@ class ReportsService:
         LIMIT 5;
         """
         
-        usuarios_result = self.execute_query(query_top_usuarios, "Top 5 usuarios más activos")
+        usuarios_result = self.execute_query_tuple(query_top_usuarios, "Top 5 usuarios más activos")
         
         if not usuarios_result:
             return []
         
         # Extraer los user_ids para buscar nombres
-        user_ids = [str(row['user_id']) for row in usuarios_result]
+        user_ids = [str(row[0]) for row in usuarios_result]
         usuarios_names = self.get_usuarios_names(user_ids)
         
+        # Columnas: user_id, total_encuestas, total_entregas, total_respuestas
         usuarios_activos = []
-        for row in usuarios_result:
-            user_id = str(row['user_id'])
+        for user_id, total_encuestas, total_entregas, total_respuestas in usuarios_result:
+            user_id = str(user_id)
             usuarios_activos.append({
                 "user_id": user_id,
                 "nombre": usuarios_names.get(user_id, f"Usuario {user_id}"),
-                "total_encuestas": row['total_encuestas'] or 0,
-                "total_entregas": row['total_entregas'] or 0,
-                "total_respuestas": row['total_respuestas'] or 0
+                "total_encuestas": total_encuestas or 0,
+                "total_entregas": total_entregas or 0,
+                "total_respuestas": total_respuestas or 0
             })
         
         return usuarios_activos
@@ -386,6 +513,7 @@ class ReportsService:
             
         except Exception as e:
             logger.error(f"Error generando conclusiones AI: {e}")
+            self._mark_error()
             return {
                 "resumen_ejecutivo": f"Error generando análisis: {str(e)}",
                 "tendencias": ["Análisis no disponible temporalmente"],
@@ -403,12 +531,19 @@ class ReportsService:
         logger.info("Generando reporte de KPIs completo...")
         
         try:
-            # Obtener todas las métricas
-            usuarios_stats = self.get_usuarios_stats()
-            respuestas_stats = self.get_respuestas_stats()
-            uso_promedio_stats = self.get_uso_promedio_stats()
-            tipos_pregunta_stats = self.get_tipos_pregunta_stats()
-            top_usuarios_stats = self.get_top_usuarios_activos()
+            # Obtener todas las métricas en paralelo, cada una con su conexión del pool
+            with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+                usuarios_future = executor.submit(self.get_usuarios_stats)
+                respuestas_future = executor.submit(self.get_respuestas_stats)
+                uso_promedio_future = executor.submit(self.get_uso_promedio_stats)
+                tipos_pregunta_future = executor.submit(self.get_tipos_pregunta_stats)
+                top_usuarios_future = executor.submit(self.get_top_usuarios_activos)
+                
+                usuarios_stats = usuarios_future.result()
+                respuestas_stats = respuestas_future.result()
+                uso_promedio_stats = uso_promedio_future.result()
+                tipos_pregunta_stats = tipos_pregunta_future.result()
+                top_usuarios_stats = top_usuarios_future.result()
             
             # Agregar promedio de encuestas a usuarios
             usuarios_stats["promedio_encuestas"] = uso_promedio_stats["encuestas_por_usuario"]
@@ -453,8 +588,8 @@ class ReportsService:
     
     def close(self):
         """Cerrar conexiones"""
-        if self.connection and not self.connection.closed:
-            self.connection.close()
+        if self.is_connected():
+            self.pool.closeall()
             logger.info("Conexión PostgreSQL cerrada")
         
         if self.mongo_client:
@@ -3,12 +3,14 @@ Servicio para manejo de archivos en AWS S3
 """
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
+import hashlib
+import io
 import os
 from dotenv import load_dotenv
 import logging
-import uuid
-from datetime import datetime
 import cv2
 import numpy as np
 
@@ -18,6 +20,56 @@ logger = logging.getLogger(__name__)
 # Cargar variables de entorno
 load_dotenv()
 
+# Archivos a partir de este tamaño se suben en partes concurrentes
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+# Configuración de transferencia compartida por todas las subidas
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=MULTIPART_THRESHOLD,
+    max_concurrency=10,
+    use_threads=True
+)
+
+# Configuración del cliente: el cliente es thread-safe y se comparte entre requests,
+# el pool debe alcanzar para subidas concurrentes (incluidas las partes multipart)
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.getenv('S3_MAX_POOL_CONNECTIONS', '50')),
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+    tcp_keepalive=True
+)
+
+# Calidad JPEG para imágenes subidas a S3
+JPEG_QUALITY = 85
+
+# libjpeg-turbo (SIMD) si está disponible; si no, se usa cv2.imencode
+try:
+    from turbojpeg import TurboJPEG
+    turbo_jpeg = TurboJPEG()
+except Exception as e:
+    logger.info(f"TurboJPEG no disponible, usando OpenCV para codificar JPEG: {e}")
+    turbo_jpeg = None
+
+def encode_jpeg(image_array):
+    """
+    Codificar imagen BGR (formato OpenCV) a JPEG
+    
+    Returns:
+        bytes o None si no se pudo codificar
+    """
+    if turbo_jpeg is not None and image_array.ndim == 3 and image_array.shape[2] == 3:
+        return turbo_jpeg.encode(image_array, quality=JPEG_QUALITY)
+    
+    # Tablas Huffman optimizadas: archivos más pequeños sin perder calidad
+    success, buffer = cv2.imencode(
+        '.jpg',
+        image_array,
+        [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+    )
+    if not success:
+        return None
+    return buffer.tobytes()
+
 class S3Service:
     def __init__(self):
         """
@@ -43,13 +95,61 @@ class S3Service:
                 's3',
                 aws_access_key_id=self.access_key,
                 aws_secret_access_key=self.secret_key,
-                region_name=self.region
+                region_name=self.region,
+                config=CLIENT_CONFIG
             )
             logger.info("Cliente S3 inicializado correctamente")
         except Exception as e:
             logger.error(f"Error inicializando cliente S3: {e}")
             self.s3_client = None
     
+    def _generate_content_key(self, prefix, user_id, data, extension):
+        """
+        Generar clave a partir del contenido: un reintento con los mismos bytes
+        produce la misma clave
+        """
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return f"{prefix}/{user_id}/{digest}.{extension}"
+    
+    def _get_file_url(self, file_key):
+        """
+        Construir URL pública de un archivo en S3
+        """
+        return f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{file_key}"
+    
+    def _put_bytes(self, file_key, data, content_type):
+        """
+        Subir bytes a S3: PUT simple para archivos pequeños, multipart para grandes
+        
+        Returns:
+            bool: False si el objeto ya existía y no se escribió
+        """
+        if len(data) < MULTIPART_THRESHOLD:
+            try:
+                # Escritura condicional: si la clave ya existe S3 responde 412
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=file_key,
+                    Body=data,
+                    ContentType=content_type,
+                    IfNoneMatch='*'
+                )
+            except ClientError as e:
+                error_code = e.response['Error']['Code']
+                status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+                if error_code in ('PreconditionFailed', 'ConditionalRequestConflict') or status in (409, 412):
+                    return False
+                raise
+        else:
+            self.s3_client.upload_fileobj(
+                io.BytesIO(data),
+                self.bucket_name,
+                file_key,
+                ExtraArgs={'ContentType': content_type},
+                Config=TRANSFER_CONFIG
+            )
+        return True
+    
     def upload_image_from_array(self, image_array, user_id, prefix="ocr"):
         """
         Subir imagen desde array numpy a S3
@@ -71,14 +171,9 @@ class S3Service:
                     "error": "Cliente S3 no inicializado"
                 }
             
-            # Generar nombre único para el archivo
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_id = str(uuid.uuid4())[:8]
-            file_key = f"{prefix}/{user_id}/{timestamp}_{file_id}.jpg"
-            
             # Convertir array numpy a bytes
-            success, buffer = cv2.imencode('.jpg', image_array)
-            if not success:
+            image_bytes = encode_jpeg(image_array)
+            if image_bytes is None:
                 return {
                     "success": False,
                     "url": None,
@@ -86,18 +181,15 @@ class S3Service:
                     "error": "Error codificando imagen"
                 }
             
-            image_bytes = buffer.tobytes()
+            # Nombre derivado del contenido para no resubir reintentos idénticos
+            file_key = self._generate_content_key(prefix, user_id, image_bytes, "jpg")
             
             # Subir archivo a S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=file_key,
-                Body=image_bytes,
-                ContentType='image/jpeg'
-            )
+            if not self._put_bytes(file_key, image_bytes, 'image/jpeg'):
+                logger.info(f"Imagen ya existente en S3, se omite la subida: {file_key}")
             
             # Generar URL del archivo
-            file_url = f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{file_key}"
+            file_url = self._get_file_url(file_key)
             
             logger.info(f"Imagen subida exitosamente a S3: {file_key}")
             
@@ -149,28 +241,21 @@ class S3Service:
                     "error": "Cliente S3 no inicializado"
                 }
             
-            # Generar nombre único manteniendo extensión original
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            file_id = str(uuid.uuid4())[:8]
-            
             # Extraer extensión del archivo original
             if '.' in filename:
                 extension = filename.split('.')[-1]
             else:
                 extension = 'bin'
             
-            file_key = f"{prefix}/{user_id}/{timestamp}_{file_id}.{extension}"
+            # Nombre derivado del contenido manteniendo extensión original
+            file_key = self._generate_content_key(prefix, user_id, file_bytes, extension)
             
             # Subir archivo a S3
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=file_key,
-                Body=file_bytes,
-                ContentType=content_type
-            )
+            if not self._put_bytes(file_key, file_bytes, content_type):
+                logger.info(f"Archivo ya existente en S3, se omite la subida: {file_key}")
             
             # Generar URL del archivo
-            file_url = f"https://{self.bucket_name}.s3.{self.region}.amazonaws.com/{file_key}"
+            file_url = self._get_file_url(file_key)
             
             logger.info(f"Archivo subido exitosamente a S3: {file_key}")
             
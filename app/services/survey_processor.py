@@ -5,6 +5,10 @@ Orquesta: QR detection -> API calls -> OCR -> Response mapping
 
 import cv2
 import numpy as np
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import TTLCache
 from app.services.qr_service import qr_service
 from app.services.encuestas_client import encuestas_client
 from app.services.ocr_service import gemini_ocr
@@ -17,14 +21,57 @@ class SurveyProcessingService:
         self.qr_service = qr_service
         self.api_client = encuestas_client
         self.ocr_service = gemini_ocr
+        
+        # Caché de plantillas por entrega_id (reintentos y varias fotos de la misma entrega)
+        self._template_cache = TTLCache(
+            maxsize=512,
+            ttl=int(os.getenv('SURVEY_TEMPLATE_CACHE_TTL', '300'))
+        )
+        self._template_lock = threading.Lock()
+        
+        # Hilos para preparar la imagen de OCR mientras se escanea el QR y se consulta la API.
+        # Cada llamador (hasta THREADPOOL_SIZE hilos del servidor) debe encontrar un hilo
+        # libre, si no la preparación hace cola y suma latencia; se crean bajo demanda
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('SURVEY_PREP_WORKERS', os.getenv('THREADPOOL_SIZE', '200')))
+        )
+    
+    def get_survey_template(self, entrega_id):
+        """
+        Obtener plantilla de encuesta procesada, usando caché por entrega_id
+        
+        Returns:
+            tuple: (template_result, survey_template); survey_template es None si la API falló
+        """
+        with self._template_lock:
+            survey_template = self._template_cache.get(entrega_id)
+        
+        if survey_template is not None:
+            return {'success': True, 'entrega_id': entrega_id, 'error': None}, survey_template
+        
+        template_result = self.api_client.get_entrega_preguntas(entrega_id)
+        if not template_result['success']:
+            return template_result, None
+        
+        survey_template = self.api_client.process_survey_template(template_result)
+        
+        with self._template_lock:
+            self._template_cache[entrega_id] = survey_template
+        
+        return template_result, survey_template
     
     def process_survey_image(self, image):
      
         try:
+            # La imagen para Gemini no depende del QR ni de la plantilla:
+            # se prepara en paralelo con los pasos 1-3
+            image_part_future = self._executor.submit(self.ocr_service.prepare_image_part, image)
+            
             # 1. Escanear QR para obtener entrega_id
             qr_result = self.qr_service.detect_qr_codes(image)
             
             if not qr_result['success'] or not qr_result['entrega_qrs']:
+                image_part_future.cancel()
                 return {
                     'success': False,
                     'error': 'No se encontró código QR con entrega ID',
@@ -33,10 +80,11 @@ class SurveyProcessingService:
             
             entrega_id = qr_result['entrega_qrs'][0]['entrega_id']
             
-            # 2. Obtener plantilla de encuesta
-            template_result = self.api_client.get_entrega_preguntas(entrega_id)
+            # 2. Obtener plantilla de encuesta (3. ya procesada)
+            template_result, survey_template = self.get_survey_template(entrega_id)
             
             if not template_result['success']:
+                image_part_future.cancel()
                 return {
                     'success': False,
                     'error': f'Error obteniendo encuesta: {template_result["error"]}',
@@ -44,11 +92,19 @@ class SurveyProcessingService:
                     'step': 'api_get'
                 }
             
-            # 3. Procesar plantilla
-            survey_template = self.api_client.process_survey_template(template_result)
-            
             # 4. Llamar a Gemini para llenar respuestas
-            ocr_result = self.ocr_service.process_survey(image, survey_template)
+            # (un fallo preparando la imagen se informa como error del paso de Gemini)
+            try:
+                image_part = image_part_future.result()
+            except Exception as e:
+                return {
+                    'success': False,
+                    'error': f'Error en Gemini: {str(e)}',
+                    'entrega_id': entrega_id,
+                    'step': 'gemini_ocr'
+                }
+            
+            ocr_result = self.ocr_service.process_survey(image_part, survey_template)
             
             if not ocr_result.get('success'):
                 return {
@@ -88,8 +144,8 @@ class SurveyProcessingService:
         Procesar encuesta cuando ya conocemos el ID (sin detección QR)
         """
         try:
-            # Obtener plantilla de encuesta desde API
-            template_result = self.api_client.get_entrega_preguntas(entrega_id)
+            # Obtener plantilla de encuesta procesada para OCR
+            template_result, survey_template = self.get_survey_template(entrega_id)
             
             if not template_result['success']:
                 return {
@@ -98,9 +154,6 @@ class SurveyProcessingService:
                     'entrega_id': entrega_id
                 }
             
-            # Procesar plantilla para OCR
-            survey_template = self.api_client.process_survey_template(template_result)
-            
             # Procesar encuesta con OCR
             ocr_result = self.ocr_service.process_survey(image, survey_template)
             
@@ -153,13 +206,11 @@ class SurveyProcessingService:
         Obtener vista previa de encuesta sin procesar imagen
         """
         try:
-            template_result = self.api_client.get_entrega_preguntas(entrega_id)
+            template_result, survey_template = self.get_survey_template(entrega_id)
             
             if not template_result['success']:
                 return template_result
             
-            survey_template = self.api_client.process_survey_template(template_result)
-            
             return {
                 'success': True,
                 'entrega_id': entrega_id,
@@ -3,45 +3,166 @@ API principal con estructura modular
 Servicio de Audio y Reportes
 """
 
-from fastapi import FastAPI
+import os
+from contextlib import asynccontextmanager
+import orjson
+from anyio import to_thread
+from fastapi import FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers.ocr_router import router as ocr_router
-from app.routers.reports_router import router as reports_router
-from app.routers.audio_router import router as audio_router
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from app.middleware.cache import ResponseCacheMiddleware
+from app.middleware.metrics import PrometheusMiddleware, render_metrics
+from app.middleware.static import StaticResponseMiddleware
+
+# Respuestas fijas serializadas una sola vez al importar
+_ROOT_BYTES = orjson.dumps({
+    "message": "API de Audio y Reportes v2.0",
+    "description": "API para procesamiento de audio con Whisper y generación de reportes"
+})
+_HEALTH_BYTES = orjson.dumps({"status": "OK", "message": "API funcionando correctamente"})
+
+# Partes de la API que sirve este despliegue (separadas por coma). Los routers
+# y servicios de los roles no incluidos no se importan ni se conectan
+ROLES = {role.strip() for role in os.getenv("ROLES", "ocr,audio,reports").split(",")}
+
+def _env_list(name, default):
+    """Lista separada por comas de una variable de entorno, sin espacios ni vacíos"""
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+# En producción no se generan ni sirven el esquema OpenAPI ni la documentación
+IS_PROD = os.getenv("ENV") == "prod"
+
+@asynccontextmanager
+async def lifespan(app):
+    # Las llamadas bloqueantes (Gemini, Whisper, S3, PostgreSQL) se delegan al
+    # threadpool de anyio; su límite por defecto de 40 hilos se queda corto
+    to_thread.current_default_thread_limiter().total_tokens = int(os.getenv("THREADPOOL_SIZE", "200"))
+    
+    # Conexiones abiertas antes de la primera petición; si una base de datos
+    # no responde, el servicio la reintenta en el primer uso
+    if ROLES & {"ocr", "audio"}:
+        from app.services.database_service import database_service
+        await run_in_threadpool(database_service.warm_up)
+    if "reports" in ROLES:
+        from app.services.reports_service import reports_service
+        await run_in_threadpool(reports_service.warm_up)
+    yield
 
 # Crear aplicación FastAPI
 app = FastAPI(
-    title="API de Audio, OCR y Reportes con IA",
-    description="API para procesamiento de audio con Whisper, OCR con Gemini y reportes",
-    version="2.0.0"
+    title=os.getenv("API_TITLE", "API de Audio, OCR y Reportes con IA"),
+    description=os.getenv(
+        "API_DESCRIPTION",
+        "API para procesamiento de audio con Whisper, OCR con Gemini y reportes"
+    ),
+    version="2.0.0",
+    lifespan=lifespan,
+    # orjson serializa todas las respuestas JSON (más rápido que json.dumps)
+    default_response_class=ORJSONResponse,
+    # Sin 307 por barra final: cada sonda mal escrita costaba dos peticiones
+    redirect_slashes=False,
+    openapi_url=None if IS_PROD else "/openapi.json",
+    docs_url=None if IS_PROD else "/docs",
+    redoc_url=None if IS_PROD else "/redoc"
+)
+
+# Caché de reportes: se agrega antes que CORS para quedar por dentro
+# (las cabeceras CORS dependen del origen de cada petición)
+app.add_middleware(
+    ResponseCacheMiddleware,
+    prefixes=("/reportes",),
+    exclude=("/reportes/health",),
+    ttl=int(os.getenv("REPORTS_CACHE_TTL", "60"))
 )
 
-# Configurar CORS
+# Compresión de respuestas JSON grandes (reportes, historial); las pequeñas
+# como /health quedan por debajo de minimum_size y salen sin comprimir.
+# Va por fuera de la caché, que guarda el cuerpo sin comprimir
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+# Configurar CORS: orígenes y cabeceras concretos (separados por coma) evitan
+# que Starlette tenga que reflejar el origen en cada petición
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  
+    allow_origins=_env_list("CORS_ALLOW_ORIGINS", "*"),
     allow_credentials=True,
-    allow_methods=["*"],  
-    allow_headers=["*"],  
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=_env_list("CORS_ALLOW_HEADERS", "*"),
+)
+
+# Métricas Prometheus: por fuera de CORS para medir también las preflight;
+# las rutas fijas de la capa siguiente no se miden
+app.add_middleware(PrometheusMiddleware)
+
+# Rutas fijas resueltas con un diccionario: se agrega al final para que sea la
+# capa más externa y responda sin pasar por CORS ni el enrutador.
+# /health/ también: la aplicación no redirige entre variantes con barra final
+app.add_middleware(
+    StaticResponseMiddleware,
+    responses={
+        "/": _ROOT_BYTES,
+        "/health": _HEALTH_BYTES,
+        "/health/": _HEALTH_BYTES,
+    }
 )
 
-# Incluir routers
-app.include_router(ocr_router)
-app.include_router(audio_router)
-app.include_router(reports_router)
+# Incluir routers según los roles del despliegue
+if "ocr" in ROLES:
+    from app.routers.ocr_router import router as ocr_router
+    app.include_router(ocr_router)
+if "audio" in ROLES:
+    from app.routers.audio_router import router as audio_router
+    app.include_router(audio_router)
+if "reports" in ROLES:
+    from app.routers.reports_router import router as reports_router
+    app.include_router(reports_router)
 
 # Endpoint principal
 @app.get("/")
 async def root():
-    return {
-        "message": "API de Audio y Reportes v2.0",
-        "description": "API para procesamiento de audio con Whisper y generación de reportes"
-    }
+    return Response(_ROOT_BYTES, media_type="application/json")
 
+# /health/ como ruta real: las peticiones con Origin no usan la tabla de rutas
+# fijas y la aplicación no redirige por barra final
 @app.get("/health")
+@app.get("/health/", include_in_schema=False)
 async def health_check():
-    return {"status": "OK", "message": "API funcionando correctamente"}
+    return Response(_HEALTH_BYTES, media_type="application/json")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    content, content_type = render_metrics()
+    return Response(content, media_type=content_type)
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)  
\ No newline at end of file
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    
+    if os.getenv("SERVER") == "granian":
+        # Servidor ASGI en Rust; uvicorn sigue siendo el predeterminado
+        from granian import Granian
+        from granian.constants import Interfaces
+        Granian(
+            "main:app",
+            address="0.0.0.0",
+            port=8000,
+            interface=Interfaces.ASGI,
+            workers=workers,
+            backlog=2048
+        ).serve()
+    else:
+        import uvicorn
+        # loop/http "auto" eligen uvloop y httptools cuando están instalados
+        # (uvloop no existe en Windows); varios workers requieren la ruta "main:app"
+        uvicorn.run(
+            "main:app",
+            host="0.0.0.0",
+            port=8000,
+            loop="auto",
+            http="auto",
+            workers=workers,
+            # Conexiones reutilizables más tiempo y cola de aceptación más grande
+            timeout_keep_alive=30,
+            backlog=2048
+        )  
\ No newline at end of file